@@ -1,13 +1,18 @@
-from .dataset import collate_sequences, gen_amino_acid_vocab
+from .dataset import collate_packed_on_device, collate_sequences, gen_amino_acid_vocab
 from .dataset import ProteinIterator, ProteinIterableDataset, ShuffledProteinIterableDataset
 from .dataset import ProteinDataset
+from .loader import PrefetchedProteinLoader
+from .sampler import LengthBucketedBatchSampler
 from .split import group_train_val_test_split, train_val_test_split
 from ..utils.imports import try_import_pytorch
 
-__all__ = ['collate_sequences',
+__all__ = ['collate_packed_on_device',
+           'collate_sequences',
            'gen_amino_acid_vocab',
            'group_train_val_test_split',
            'train_val_test_split',
+           'LengthBucketedBatchSampler',
+           'PrefetchedProteinLoader',
            'ProteinDataset',
            'ProteinIterator',
            'ProteinIterableDataset',
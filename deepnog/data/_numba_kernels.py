@@ -0,0 +1,52 @@
+"""
+Date: 2026-10-15
+
+Description:
+
+    Optional Numba kernels for collating batches of encoded sequences.
+    If Numba is not installed, callers fall back to NumPy.
+"""
+# SPDX-License-Identifier: BSD-3-Clause
+import numpy as np
+
+try:
+    from numba import njit
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
+__all__ = ['_NUMBA_AVAILABLE',
+           'pad_into',
+           ]
+
+
+def _pad_into(out, flat, offsets, starts):
+    """ Copy concatenated encoded sequences into a zero-padded matrix.
+
+    Parameters
+    ----------
+    out : np.ndarray, shape (n_sequences, max_len)
+        Zero-initialized output matrix, filled in-place.
+    flat : np.ndarray
+        All encoded sequences of the batch concatenated.
+    offsets : np.ndarray, shape (n_sequences + 1,)
+        Sequence i is stored in ``flat[offsets[i]:offsets[i + 1]]``.
+    starts : np.ndarray, shape (n_sequences,)
+        Column in ``out`` where sequence i starts (random padding offset).
+    """
+    for i in range(out.shape[0]):
+        start = starts[i]
+        for j in range(offsets[i], offsets[i + 1]):
+            out[i, start + j - offsets[i]] = flat[j]
+
+
+if _NUMBA_AVAILABLE:
+    pad_into = njit(cache=True, boundscheck=False)(_pad_into)
+    # Compile once at import for the common dtypes,
+    # instead of during the first batch.
+    pad_into(np.zeros((1, 1), dtype=np.uint8),
+             np.zeros(1, dtype=np.uint8),
+             np.array([0, 1], dtype=np.int64),
+             np.zeros(1, dtype=np.int64))
+else:
+    pad_into = None
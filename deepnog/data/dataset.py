@@ -10,8 +10,11 @@ Description:
 """
 import gzip
 from itertools import islice
+import mmap
+import os
 from pathlib import Path
-from typing import List, Union, NamedTuple, Sequence
+from types import SimpleNamespace
+from typing import Iterator, List, Union, NamedTuple, Sequence, Tuple
 import warnings
 
 import numpy as np
@@ -19,15 +22,16 @@ import pandas as pd
 from sklearn.preprocessing import LabelEncoder
 from Bio.SeqRecord import SeqRecord
 
+from ._numba_kernels import _NUMBA_AVAILABLE, pad_into
 from ..utils import get_logger, SynchronizedCounter
 from ..utils import EXTENDED_IUPAC_PROTEIN_ALPHABET, parse, SeqIO
 from ..utils import try_import_pytorch
 
 torch = try_import_pytorch()
 from torch.utils.data import Dataset, IterableDataset  # noqa
-from torch.utils.data.dataloader import default_collate  # noqa
 
-__all__ = ['collate_sequences',
+__all__ = ['collate_packed_on_device',
+           'collate_sequences',
            'gen_amino_acid_vocab',
            'ProteinDataset',
            'ProteinIterableDataset',
@@ -39,8 +43,8 @@ __all__ = ['collate_sequences',
 sequence_tuple = NamedTuple('sequence',
                             [('index', int),
                              ('id', str),
-                             ('string', str),
-                             ('encoded', list),
+                             ('string', Union[str, None]),
+                             ('encoded', np.ndarray),
                              ('label', torch.Tensor)])
 
 # Class of data-minibatches
@@ -50,19 +54,67 @@ collated_sequences = NamedTuple('collated_sequences',
                                  ('sequences', torch.Tensor),
                                  ('labels', torch.Tensor)])
 
-UNINITIALIZED_POS = -999
+# Class of structure-of-arrays batches of raw (not yet encoded) sequences:
+# sequence i is stored in arena[offsets[i]:offsets[i + 1]]
+packed_sequences = NamedTuple('packed_sequences',
+                              [('indices', List[int]),
+                               ('ids', List[str]),
+                               ('arena', bytes),
+                               ('offsets', np.ndarray),
+                               ('labels', np.ndarray)])
 
 
-def collate_sequences(batch: Union[List[sequence_tuple], sequence_tuple],
+# Below this mean sequence length, a single flat scatter beats
+# copying row by row (per-row Python overhead dominates)
+_SCATTER_MAX_MEAN_LENGTH = 64
+
+
+def _pad_into_numpy(out: np.ndarray, flat: np.ndarray,
+                    offsets: np.ndarray, starts: np.ndarray):
+    """ NumPy fallback of ``_numba_kernels.pad_into()``.
+
+    Batches of short sequences are scattered into ``out`` in one
+    vectorized assignment without Python loops.
+    Longer sequences are copied row by row, which avoids building
+    per-residue index arrays.
+    """
+    n_data = out.shape[0]
+    lengths = np.diff(offsets)
+    if flat.size < _SCATTER_MAX_MEAN_LENGTH * n_data:
+        rows = np.repeat(np.arange(n_data), lengths)
+        cols = np.arange(flat.size) - np.repeat(offsets[:-1] - starts, lengths)
+        out[rows, cols] = flat
+    else:
+        for i in range(n_data):
+            start = starts[i]
+            out[i, start:start + lengths[i]] = flat[offsets[i]:offsets[i + 1]]
+
+
+def _packed_labels(batch: packed_sequences, has_labels: bool = None):
+    """ Labels of a packed batch, or None, if they are not collated.
+
+    Raises TypeError, if ``has_labels`` is True, but the batch has no labels.
+    """
+    if has_labels is False:
+        return None
+    if batch.labels is None and has_labels:
+        raise TypeError('Cannot collate labels of packed sequences without labels.')
+    return batch.labels
+
+
+def collate_sequences(batch: Union[List[sequence_tuple], sequence_tuple,
+                                   packed_sequences],
                       zero_padding: bool = True, min_length: int = 36,
-                      random_padding: bool = False) -> collated_sequences:
+                      random_padding: bool = False,
+                      lut: np.ndarray = None,
+                      has_labels: bool = None) -> collated_sequences:
     """ Collate and zero-pad encoded sequence.
 
     Parameters
     ----------
     batch : namedtuple, or list of namedtuples
         Batch of protein sequences to classify stored as a namedtuple
-        sequence.
+        sequence, or as a single namedtuple packed_sequences.
     zero_padding : bool
         Zero-pad protein sequences, that is, append zeros until every sequence
         is as long as the longest sequences in batch.
@@ -75,6 +127,15 @@ def collate_sequences(batch: Union[List[sequence_tuple], sequence_tuple],
         Zero pad sequences by prepending and appending zeros. The fraction
         is determined randomly. This may counter detrimental effects, when
         short sequences would always have long zero-tails, otherwise.
+    lut : np.ndarray, optional
+        Byte lookup table used for encoding packed_sequences.
+        If None, use the default amino-acid vocabulary.
+    has_labels : bool, optional
+        Whether the sequences carry labels. If False, skip collating labels
+        (e.g. during inference). If True, raise TypeError, if labels
+        are missing. If None (default), collate labels, if all
+        sequences have one.
+
     Returns
     -------
     batch : NamedTuple
@@ -84,52 +145,154 @@ def collate_sequences(batch: Union[List[sequence_tuple], sequence_tuple],
     if not zero_padding:
         warnings.warn(f"Called collate_sequences(zero_padding={zero_padding}). "
                       f"However, all sequences will currently be zero-padded.")
-    # Check if an individual sample or a batch was given
-    if not isinstance(batch, list):
-        batch = [batch]
+    if isinstance(batch, packed_sequences):
+        # Encode all sequences of the batch in one vectorized pass
+        if lut is None:
+            lut = _DEFAULT_LUT
+        flat = lut[np.frombuffer(batch.arena, dtype=np.uint8)]
+        offsets = batch.offsets.astype(np.int64)
+        lengths = np.diff(offsets)
+        n_data = lengths.size
+        ids = batch.ids
+        indices: List[int] = batch.indices
+        labels = _packed_labels(batch, has_labels)
+        if labels is not None:
+            labels = torch.from_numpy(labels)
+    else:
+        # Check if an individual sample or a batch was given
+        if not isinstance(batch, list):
+            batch = [batch]
+        n_data = len(batch)
+        lengths = np.fromiter((len(seq.encoded) for seq in batch),
+                              dtype=np.int64, count=n_data)
+        offsets = np.zeros(n_data + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        flat = np.concatenate([np.asarray(seq.encoded) for seq in batch])
+
+        # Collate the protein ids (str)
+        ids = [seq.id for seq in batch]
+
+        # Collate the numerical indices
+        indices: List[int] = [seq.index for seq in batch]
+
+        # Collate the labels
+        if has_labels is False:
+            labels = None
+        else:
+            try:
+                labels = torch.as_tensor(np.fromiter((b.label for b in batch),
+                                                     dtype=np.int64,
+                                                     count=n_data))
+            except (AttributeError, TypeError):
+                if has_labels:
+                    raise
+                labels = None
 
     # Find the longest sequence, in order to zero pad the others
-    max_len = min_length
-    n_data = 0
-    for seq in batch:
-        sequence = seq.encoded
-        n_data += 1
-        sequence_len = len(sequence)
-        if sequence_len > max_len:
-            max_len = sequence_len
-
-    # Collate the sequences
-    sequences = np.zeros((n_data, max_len,), dtype=np.int32)
-    for i, seq in enumerate(batch):
-        sequence = np.array(seq.encoded)
-        # If selected, choose randomly, where to insert zeros
-        if random_padding and len(sequence) < max_len:
-            n_zeros = max_len - len(sequence)
-            start = np.random.choice(n_zeros + 1)
-            end = start + len(sequence)
-        else:
-            start = 0
-            end = len(sequence)
-        # Zero pad
-        sequences[i, start:end] = sequence[:].T
-    # Convert NumPy array to PyTorch Tensor
-    sequences = default_collate(sequences)
+    max_len = max(min_length, lengths.max())
+
+    # If selected, choose randomly, where to insert zeros
+    # (drawing the offsets of all sequences at once)
+    if random_padding:
+        starts = (np.random.rand(n_data) * (max_len - lengths + 1)).astype(np.int64)
+    else:
+        starts = np.zeros(n_data, dtype=np.int64)
+
+    # Collate the sequences into a preallocated, zero-padded matrix.
+    # The vocabulary fits into uint8, which saves memory bandwidth;
+    # models convert to int64 indices at the embedding layer.
+    sequences = np.zeros((n_data, max_len), dtype=np.uint8)
+    if _NUMBA_AVAILABLE:
+        pad_into(sequences, flat, offsets, starts)
+    else:
+        _pad_into_numpy(sequences, flat, offsets, starts)
+    sequences = torch.from_numpy(sequences)
 
-    # Collate the protein ids (str)
-    ids = [seq.id for seq in batch]
+    return collated_sequences(indices=indices,
+                              ids=ids,
+                              sequences=sequences,
+                              labels=labels)
 
-    # Collate the numerical indices
-    indices: List[int] = [seq.index for seq in batch]
 
-    # Collate the labels
-    try:
-        labels = np.array([b.label for b in batch], dtype=np.int32)
-        labels = default_collate(labels)
-    except (AttributeError, TypeError):
-        labels = None
+def collate_packed_on_device(batch: packed_sequences, device='cpu',
+                             min_length: int = 36, random_padding: bool = False,
+                             lut: np.ndarray = None,
+                             has_labels: bool = None) -> collated_sequences:
+    """ Encode and zero-pad packed sequences on the target device.
 
-    return collated_sequences(indices=indices,
-                              ids=ids,
+    Only the raw bytes of the arena are copied to the device (from pinned
+    memory for CUDA devices), where they are encoded with a single gather
+    from the lookup table, and scattered into the zero-padded batch.
+    This moves the encoding cost off the CPU for large batches.
+
+    NOTE: CUDA may not be used in DataLoader worker processes, so call
+    this function in the main process (e.g. via PrefetchedProteinLoader).
+
+    Parameters
+    ----------
+    batch : namedtuple
+        Batch of protein sequences stored as packed_sequences.
+    device : [str, torch.device], optional
+        Device to encode sequences on, and to store the batch.
+    min_length : int, optional
+        Zero-pad sequences to at least ``min_length``.
+    random_padding : bool, optional
+        Zero pad sequences by prepending and appending zeros.
+        The fraction is determined randomly.
+    lut : np.ndarray, optional
+        Byte lookup table used for encoding.
+        If None, use the default amino-acid vocabulary.
+    has_labels : bool, optional
+        If False, skip collating labels.
+
+    Returns
+    -------
+    batch : NamedTuple
+        Input batch zero-padded and stored in namedtuple
+        collated_sequences on the target device.
+    """
+    device = torch.device(device)
+    if lut is None:
+        lut = _DEFAULT_LUT
+    key = (str(device), lut.tobytes())
+    lut_device = _DEVICE_LUTS.get(key)
+    if lut_device is None:
+        lut_device = _DEVICE_LUTS[key] = torch.as_tensor(lut, device=device)
+
+    # Copy raw bytes to the device, and encode them there
+    arena = torch.empty(len(batch.arena), dtype=torch.uint8,
+                        pin_memory=device.type == 'cuda')
+    arena.numpy()[:] = np.frombuffer(batch.arena, dtype=np.uint8)
+    arena = arena.to(device, non_blocking=True)
+    encoded = lut_device[arena.long()]
+
+    # Padding offsets are determined on the host
+    offsets = torch.as_tensor(batch.offsets).long()
+    lengths = offsets[1:] - offsets[:-1]
+    n_data = lengths.numel()
+    max_len = max(min_length, int(lengths.max()))
+    if random_padding:
+        starts = (np.random.rand(n_data) * (max_len - lengths.numpy() + 1)).astype(np.int64)
+        starts = torch.from_numpy(starts)
+    else:
+        starts = torch.zeros(n_data, dtype=torch.int64)
+
+    # Scatter encoded sequences into the zero-padded batch
+    n_residues = encoded.numel()
+    lengths = lengths.to(device, non_blocking=True)
+    shift = (offsets[:-1] - starts).to(device, non_blocking=True)
+    rows = torch.repeat_interleave(torch.arange(n_data, device=device), lengths)
+    cols = (torch.arange(n_residues, device=device)
+            - torch.repeat_interleave(shift, lengths))
+    sequences = torch.zeros((n_data, max_len), dtype=torch.uint8, device=device)
+    sequences[rows, cols] = encoded
+
+    labels = _packed_labels(batch, has_labels)
+    if labels is not None:
+        labels = torch.as_tensor(labels).to(device, non_blocking=True)
+
+    return collated_sequences(indices=list(batch.indices),
+                              ids=list(batch.ids),
                               sequences=sequences,
                               labels=labels)
 
@@ -169,14 +332,166 @@ def gen_amino_acid_vocab(alphabet=None):
     return vocab
 
 
-def _consume(iterator, n: int):
-    """ Advance the iterator n-steps ahead. If n is None, consume entirely.
+def _gen_lookup_table(vocab) -> np.ndarray:
+    """ Translate an amino-acid vocabulary into a byte lookup table.
+
+    Parameters
+    ----------
+    vocab : dict
+        Mapping of amino acid characters to numbers,
+        as obtained from ``gen_amino_acid_vocab()``.
+
+    Returns
+    -------
+    lut : np.ndarray, shape (256,)
+        Array mapping each ASCII byte to its vocabulary number.
+        Characters not in the vocabulary are mapped to zero.
+    """
+    lut = np.zeros(256, dtype=np.uint8)
+    for key, value in vocab.items():
+        lut[ord(key)] = value
+    return lut
+
+
+_DEFAULT_LUT = _gen_lookup_table(gen_amino_acid_vocab())
+# Lookup tables already copied to devices
+_DEVICE_LUTS = {}
+
+
+def _as_bytes(seq) -> bytes:
+    """ Raw bytes of a sequence given as bytes, str, or Biopython Seq. """
+    if isinstance(seq, bytes):
+        return seq
+    return str(seq).encode('ascii', errors='replace')
+
+
+def _as_str(seq) -> str:
+    """ String of a sequence given as bytes, str, or Biopython Seq. """
+    if isinstance(seq, bytes):
+        return seq.decode('ascii', errors='replace')
+    return str(seq)
+
+
+def _encode(seq, lut: np.ndarray) -> np.ndarray:
+    """ Encode a sequence with a byte lookup table in one vectorized pass. """
+    seq_bytes = np.frombuffer(_as_bytes(seq), dtype=np.uint8)
+    return lut[seq_bytes]
+
+
+def _gen_label_from_id(labels: pd.DataFrame) -> dict:
+    """ Map protein ids to numerical labels.
+
+    NOTE: this only supports single-label experiments!
+    In case of multi-labels, the last label will overwrite
+    any previously seen labels.
+    """
+    return dict(zip(labels.protein_id.values, labels.label_num.values))
+
+
+def _fasta_record_offsets(file_, chunk_size: int = 2**20) -> Union[np.ndarray, None]:
+    """ Index the byte offsets of all records in an uncompressed FASTA file.
+
+    Scans the file in chunks for '>' at the beginning of lines.
+    Files that do not start with '>' are not indexed, so that they are
+    parsed (and rejected, if malformed) by Biopython.
+
+    Parameters
+    ----------
+    file_ : str, Path
+        Path to uncompressed FASTA file
+    chunk_size : int, optional
+        Number of bytes read at once
+
+    Returns
+    -------
+    offsets : np.ndarray, shape (n_records + 1,) or None
+        Record i is stored in bytes offsets[i] to offsets[i + 1]
+        (the last entry is the file size), or None, if the file is
+        not empty and does not start with a FASTA record.
+    """
+    offsets = []
+    previous = b'\n'  # beginning of file is beginning of a line
+    pos = 0
+    with open(file_, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            if pos == 0 and chunk[:1] != b'>':
+                return None
+            buf = np.frombuffer(previous + chunk, dtype=np.uint8)
+            starts = np.flatnonzero((buf[1:] == ord('>')) & (buf[:-1] == ord('\n')))
+            offsets.append(starts + pos)
+            pos += len(chunk)
+            previous = chunk[-1:]
+    offsets.append([pos])
+    return np.concatenate(offsets).astype(np.int64)
+
+
+# Lightweight FASTA record with raw sequence bytes
+_fasta_record = NamedTuple('_fasta_record',
+                           [('id', str),
+                            ('seq', bytes)])
+
+
+def _parse_fasta_title(mm: mmap.mmap, begin: int, end: int) -> Tuple[str, int]:
+    """ Parse the identifier of the FASTA record in mm[begin:end].
+
+    Identifiers follow Biopython's FASTA parser (first word of the title line).
 
-    Function from Itertools Recipes in official Python 3.7.4. docs.
+    Returns
+    -------
+    sequence_id : str
+        Record identifier, possibly empty
+    header_end : int
+        Position of the newline ending the title line
+    """
+    header_end = mm.find(b'\n', begin, end)
+    if header_end == -1:
+        header_end = end
+    title = mm[begin + 1:header_end].decode().strip()
+    sequence_id = title.split(None, 1)[0] if title else ''
+    return sequence_id, header_end
+
+
+def _fasta_record_ids(file_, offsets: np.ndarray) -> Iterator[str]:
+    """ Parse the identifiers of all records in an indexed FASTA file. """
+    if offsets.size < 2 or offsets[-1] == 0:
+        return
+    with open(file_, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(offsets.size - 1):
+            yield _parse_fasta_title(mm, offsets[i], offsets[i + 1])[0]
+
+
+def _iter_indexed_records(file_, offsets: np.ndarray, start: int, step: int,
+                          selection: np.ndarray = None):
+    """ Parse every step-th record of a memory-mapped FASTA file,
+    beginning with record start.
+
+    Records are parsed directly from the mapped bytes, skipping
+    Biopython and str decoding of sequences. Like Biopython, all
+    ASCII whitespace is removed from sequences. Unlike Biopython,
+    non-ASCII characters are not decoded, so that a multi-byte
+    character is encoded as several unknown residues.
+    If ``selection`` is given, only these record numbers are considered.
+
+    Yields 1-based record positions and records, just like
+    enumerate(SeqIO.parse(...), start=1) restricted to these records.
     """
-    # Use functions that consume iterators at C speed.
-    # advance to the empty slice starting at position n
-    next(islice(iterator, n, n), None)
+    if offsets.size < 2 or offsets[-1] == 0:
+        return
+    if selection is None:
+        records = range(start, offsets.size - 1, step)
+    else:
+        records = selection[start::step]
+    with open(file_, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in records:
+            begin, end = offsets[i], offsets[i + 1]
+            sequence_id, header_end = _parse_fasta_title(mm, begin, end)
+            seq = mm[header_end + 1:end].translate(None, b' \t\r\n\v\f')
+            yield i + 1, _fasta_record(id=sequence_id, seq=seq)
 
 
 class ProteinIterator:
@@ -192,11 +507,12 @@ class ProteinIterator:
     it informs the main module about the number of skipped sequences (due to
     empty ids) through setting a global variable in the main module.
 
-    In the multi-process loading case, each ProteinIterator loads a sequence
-    and then skips the next few sequences dedicated to the other workers.
-    This works by each worker skipping num_worker - 1 data samples
-    for each call to __next__(). Furthermore, each worker skips
-    worker_id data samples in the initialization.
+    In the multi-process loading case, sequences are dispatched to workers
+    in a round-robin fashion: each ProteinIterator only returns sequences
+    whose position in the file modulo num_workers equals its worker_id.
+    If an index of record byte offsets is available, each worker parses
+    only its sequences directly from the memory-mapped file. Otherwise, sequences
+    dedicated to other workers are parsed and skipped at C speed.
 
     The ProteinIterator class also makes sure that a unique ID is set for each
     SeqRecord obtained from the data-iterator. This allows unambiguous handling
@@ -220,48 +536,161 @@ class ProteinIterator:
     f_format : str
         File format in which to expect the protein sequences.
         Must be supported by Biopython's Bio.SeqIO class.
+    n_skipped : [int, SynchronizedCounter], optional
+        Counter of sequences skipped due to empty ids (or missing labels).
+        It is updated once, when the iterator is exhausted.
     num_workers : int
         Number of workers set in DataLoader or one if no workers set.
         If bigger or equal to two, the multi-process loading case happens.
     worker_id : int
         ID of worker this iterator belongs to
+    lut : np.ndarray, optional
+        Byte lookup table used for encoding sequences.
+        If None, it is generated from ``aa_vocab``.
+    label_from_id : dict, optional
+        Mapping of protein ids to numerical labels.
+        If None, it is generated from ``labels``. Datasets pass a shared
+        mapping here, so that it is not rebuilt by every worker.
+    offsets : np.ndarray, optional
+        Byte offsets of the records in an uncompressed sequence file
+        (see ``ProteinIterableDataset._build_offset_index()``).
+        If None, the file is parsed sequentially.
+    selection : np.ndarray, optional
+        Record numbers (zero-based) to dispatch to workers, if ``offsets``
+        are given, e.g. only labeled records. If None, use all records.
+    keep_string : bool, optional
+        Store the sequence string in the ``string`` field of each sequence.
+        By default, ``string`` is None, which saves one string allocation
+        per sequence, since collating and models only use the encoded
+        sequence.
     """
 
     def __init__(self, file_, labels: pd.DataFrame, aa_vocab, f_format,
                  n_skipped: Union[int, SynchronizedCounter] = 0,
-                 num_workers=1, worker_id=0):
+                 num_workers=1, worker_id=0, lut: np.ndarray = None,
+                 label_from_id: dict = None, offsets: np.ndarray = None,
+                 selection: np.ndarray = None, keep_string: bool = False):
         # Generate file-iterator
-        if Path(file_).suffix == '.gz':
+        if offsets is not None:
+            iterator = None
+        elif Path(file_).suffix == '.gz':
             f = gzip.open(file_, 'rt')
             iterator = SeqIO.parse(f, format=f_format, )
         else:
             iterator = SeqIO.parse(file_, format=f_format, )
-        self.iterator = iterator
+        # Dispatch every num_workers-th sequence (1-based positions)
+        # to this worker, starting at worker_id.
+        if offsets is None:
+            self.iterator = islice(enumerate(iterator, start=1),
+                                   worker_id, None, num_workers)
+        else:
+            self.iterator = _iter_indexed_records(file_, offsets,
+                                                  start=worker_id, step=num_workers,
+                                                  selection=selection)
 
         if labels is None:
             self.has_labels = False
             self.label_from_id = {}
         else:
-            # NOTE: this only supports single-label experiments!
-            # In case of multi-labels, the last label will overwrite
-            # any previously seen labels.
-            self.label_from_id = {row.protein_id: row.label_num
-                                  for row in labels.itertuples()}
+            if label_from_id is None:
+                label_from_id = _gen_label_from_id(labels)
+            self.label_from_id = label_from_id
             self.has_labels = True
 
         self.vocab = aa_vocab
+        if lut is None:
+            lut = _gen_lookup_table(aa_vocab)
+        self.lut = lut
         self.n_skipped = n_skipped
-
-        # Start position
-        self.start: int = worker_id
-        self.pos: int = UNINITIALIZED_POS
-
-        # Number of sequences to skip for each next() call.
-        self.step: int = num_workers - 1
+        # Skipped sequences are counted locally, and added to the
+        # (possibly lock-protected) n_skipped counter once at the end.
+        self._n_skipped_local: int = 0
+        self.num_workers: int = num_workers
+        self.worker_id: int = worker_id
+        self.keep_string = keep_string
 
     def __iter__(self):
         return self
 
+    def _next_record(self):
+        """ Return position, id, SeqRecord, and label of the next sequence. """
+        try:
+            pos, next_seq = next(self.iterator)
+            # If sequence has no identifier, skip it.
+            # Also skip sequences that should have labels, but don't.
+            sequence_id: str = next_seq.id
+            label = self.label_from_id.get(sequence_id)
+            while sequence_id == '' or (self.has_labels and label is None):
+                self._n_skipped_local += 1
+                pos, next_seq = next(self.iterator)
+                sequence_id: str = next_seq.id
+                label = self.label_from_id.get(sequence_id)
+        except StopIteration:
+            self._flush_skipped()
+            raise
+        return pos, sequence_id, next_seq, label
+
+    def _flush_skipped(self):
+        """ Add locally counted skipped sequences to ``n_skipped``. """
+        if self._n_skipped_local:
+            self.n_skipped += self._n_skipped_local
+            self._n_skipped_local = 0
+
+    def next_packed(self, batch_size: int) -> packed_sequences:
+        """ Return the next protein sequences as structure-of-arrays batch.
+
+        Sequences are not encoded, but concatenated as raw bytes into a
+        single arena, which is cheap to pickle between worker processes.
+        Encoding happens in one vectorized pass in ``collate_sequences``.
+
+        Parameters
+        ----------
+        batch_size : int
+            Maximum number of sequences in the batch.
+            Fewer sequences are returned at the end of the file.
+
+        Returns
+        -------
+        batch : namedtuple
+            Next sequences dedicated to this worker as packed_sequences.
+        """
+        indices: List[int] = []
+        ids: List[str] = []
+        labels = []
+        arena = bytearray()
+        offsets = np.zeros(batch_size + 1, dtype=np.int32)
+        n = 0
+        while n < batch_size:
+            try:
+                pos, sequence_id, next_seq, label = self._next_record()
+            except StopIteration:
+                break
+            arena += _as_bytes(next_seq.seq)
+            n += 1
+            offsets[n] = len(arena)
+            indices.append(pos)
+            ids.append(sequence_id)
+            labels.append(label)
+        if n == 0:
+            raise StopIteration
+        if self.has_labels:
+            labels = np.array(labels, dtype=np.int64)
+        else:
+            labels = None
+        return packed_sequences(indices=indices,
+                                ids=ids,
+                                arena=bytes(arena),
+                                offsets=offsets[:n + 1],
+                                labels=labels)
+
+    def iter_packed(self, batch_size: int):
+        """ Iterate over the remaining sequences in packed batches. """
+        while True:
+            try:
+                yield self.next_packed(batch_size)
+            except StopIteration:
+                return
+
     def __next__(self):
         """ Return next protein sequence in datafile as sequence object.
 
@@ -271,43 +700,30 @@ class ProteinIterator:
         Returns
         -------
         sequence : namedtuple
-            Element at current + step + 1 position or start position.
+            Next element dedicated to this worker.
             Furthermore prefixes element with unique sequential ID.
             Contains sequence data and metadata, i.e. all relevant
             information deepnog needs to perform and store predictions
             for one protein sequence.
         """
-        # Check if iterator has been positioned correctly.
-        if self.pos == UNINITIALIZED_POS:
-            _consume(self.iterator, n=self.start)
-            self.pos = self.start + 1
-        else:
-            _consume(self.iterator, n=self.step)
-            self.pos += self.step + 1
-
-        next_seq = next(self.iterator)
-        # If sequence has no identifier, skip it.
-        # Also skip sequences that should have labels, but don't.
-        sequence_id: str = f'{next_seq.id}'
-        label = self.label_from_id.get(sequence_id)
-        while sequence_id == '' or (self.has_labels and label is None):
-            self.n_skipped += 1
-            _consume(self.iterator, n=self.step)
-            self.pos += self.step + 1
-            next_seq = next(self.iterator)
-            sequence_id: str = f'{next_seq.id}'
-            label = self.label_from_id.get(sequence_id)
+        pos, sequence_id, next_seq, label = self._next_record()
         # Generate sequence object from SeqRecord
-        encoded = [self.vocab.get(c, 0) for c in next_seq.seq]
-        sequence = sequence_tuple(index=self.pos,
+        encoded = _encode(next_seq.seq, self.lut)
+        sequence = sequence_tuple(index=pos,
                                   id=sequence_id,
-                                  string=str(next_seq.seq),
+                                  string=_as_str(next_seq.seq) if self.keep_string else None,
                                   encoded=encoded,
                                   label=label)
 
         return sequence
 
 
+def _get_worker_info():
+    """ DataLoader worker info, or a single worker in the main process. """
+    return (torch.utils.data.get_worker_info()
+            or SimpleNamespace(num_workers=1, id=0))
+
+
 class ProteinIterableDataset(IterableDataset):
     """ Protein dataset holding the proteins to classify.
 
@@ -334,18 +750,32 @@ class ProteinIterableDataset(IterableDataset):
     label_encoder : LabelEncoder, optional
         The label encoder maps str class names to numerical labels.
         Provide a label encoder during validation.
+    batch_size : int, optional
+        If None (default), yield individual sequences.
+        Otherwise, yield packed_sequences batches of up to ``batch_size``
+        sequences, which is cheaper for multiprocess data loading.
+        In this case, use ``DataLoader(dataset, batch_size=None, ...)``.
+    keep_string : bool, optional
+        Store the sequence string in the ``string`` field of each sequence.
+        By default, ``string`` is None, which saves one string allocation
+        per sequence, since collating and models only use the encoded
+        sequence.
     """
 
     def __init__(self, file, labels_file: str = None, f_format='fasta',
-                 label_encoder: LabelEncoder = None):
+                 label_encoder: LabelEncoder = None, batch_size: int = None,
+                 keep_string: bool = False):
         """ Initialize sequence dataset from file."""
         self.file = file
         self.f_format = f_format
+        self.batch_size = batch_size
+        self.keep_string = keep_string
 
         # Read labels, if available
         self.labels_file = labels_file
         if self.labels_file is None:
             self.labels = None
+            self.label_from_id = {}
         else:
             self.labels = pd.read_csv(labels_file,
                                       index_col=0,
@@ -366,32 +796,88 @@ class ProteinIterableDataset(IterableDataset):
                 self.label_encoder = label_encoder
                 self.labels['label_num'] = self.label_encoder.transform(
                     self.labels.eggnog_id)
+            # Built once and shared with all workers' iterators
+            self.label_from_id = _gen_label_from_id(self.labels)
 
         # Generate amino-acid vocabulary
         self.alphabet = EXTENDED_IUPAC_PROTEIN_ALPHABET
         self.vocab = gen_amino_acid_vocab(self.alphabet)
+        self.lut = _gen_lookup_table(self.vocab)
+
+        # Index record offsets once, so that workers may seek their records
+        self.offsets = self._build_offset_index()
+        # Only dispatch labeled records to workers
+        self.selection = self._select_labeled_records()
 
         self.n_skipped = SynchronizedCounter(init=0)
 
+    def _build_offset_index(self) -> Union[np.ndarray, None]:
+        """ Index record byte offsets of uncompressed FASTA files.
+
+        Returns
+        -------
+        offsets : np.ndarray or None
+            Byte offsets of records, or None, if the file is compressed,
+            not a regular file (e.g. a named pipe), or not in FASTA format.
+        """
+        if self.f_format != 'fasta' or not isinstance(self.file, (str, Path)):
+            return None
+        if Path(self.file).suffix in ['.gz', '.gzip', '.xz', '.lzma']:
+            return None
+        # Pipes can only be read once, so they are parsed sequentially
+        if not Path(self.file).is_file():
+            return None
+        return _fasta_record_offsets(self.file)
+
+    def _select_labeled_records(self) -> Union[np.ndarray, None]:
+        """ Select records with labels from the offset index.
+
+        Unlabeled records are thus never parsed by workers during training.
+        Note that they are not counted in ``n_skipped``.
+
+        Returns
+        -------
+        selection : np.ndarray or None
+            Numbers of labeled records, or None, if there are no labels
+            or no offset index.
+        """
+        if self.labels is None or self.offsets is None:
+            return None
+        record_ids = _fasta_record_ids(self.file, self.offsets)
+        return np.flatnonzero(np.fromiter((i in self.label_from_id for i in record_ids),
+                                          dtype=bool, count=self.offsets.size - 1))
+
     def __iter__(self):
         """ Return iterator over sequences in file. """
-        worker_info = torch.utils.data.get_worker_info()
-        if worker_info is None:
-            return ProteinIterator(self.file, self.labels, self.vocab,
-                                   self.f_format, n_skipped=0)
-        else:
-            return ProteinIterator(self.file, self.labels, self.vocab,
+        worker_info = _get_worker_info()
+        iterator = ProteinIterator(self.file, self.labels, self.vocab,
                                    self.f_format, n_skipped=self.n_skipped,
                                    num_workers=worker_info.num_workers,
-                                   worker_id=worker_info.id)
+                                   worker_id=worker_info.id, lut=self.lut,
+                                   label_from_id=self.label_from_id,
+                                   offsets=self.offsets,
+                                   selection=self.selection,
+                                   keep_string=self.keep_string)
+        if self.batch_size is None:
+            return iterator
+        else:
+            return iterator.iter_packed(self.batch_size)
 
     def __len__(self):
+        """ Number of sequences, or of packed batches, if ``batch_size`` is set.
+
+        NOTE: with multiprocess data loading, each worker packs its own
+        batches, so that up to one additional batch per worker may be yielded.
+        """
         try:
-            return self.labels.label_num.size
+            n_sequences = self.labels.label_num.size
         except AttributeError:
             raise TypeError(f"object of type {type(self)} has no len(), "
                             f"unless a label file is provided during its "
                             f"construction.") from None
+        if self.batch_size is None:
+            return n_sequences
+        return -(-n_sequences // self.batch_size)
 
 
 class ShuffledProteinIterableDataset(ProteinIterableDataset):
@@ -416,6 +902,20 @@ class ShuffledProteinIterableDataset(ProteinIterableDataset):
         Provide a label encoder during validation.
     buffer_size : int
         How many objects will be buffered, i.e. are available to choose from.
+    in_memory : bool or 'auto', optional
+        Cache all sequences during the first complete epoch, and serve
+        subsequent epochs from memory in a truly shuffled order, instead of
+        parsing the file again. If 'auto', only cache uncompressed FASTA files,
+        when more than twice the file size of memory is available.
+        Default: False.
+        NOTE: with multiprocess data loading, each worker caches its share
+        of sequences, which only persists with
+        ``DataLoader(..., persistent_workers=True)``.
+    keep_string : bool, optional
+        Store the sequence string in the ``string`` field of each sequence.
+        By default, ``string`` is None, which saves one string allocation
+        per sequence, since collating and models only use the encoded
+        sequence.
 
     References
     ----------
@@ -423,23 +923,59 @@ class ShuffledProteinIterableDataset(ProteinIterableDataset):
     https://discuss.pytorch.org/t/how-to-shuffle-an-iterable-dataset/64130/5
     """
     def __init__(self, file, labels_file: str = None, f_format='fasta',
-                 label_encoder: LabelEncoder = None, buffer_size: int = 1000):
+                 label_encoder: LabelEncoder = None, buffer_size: int = 1000,
+                 in_memory: Union[bool, str] = False, keep_string: bool = False):
         super().__init__(file=file, labels_file=labels_file, f_format=f_format,
-                         label_encoder=label_encoder)
+                         label_encoder=label_encoder, keep_string=keep_string)
         self.dataset = self
         self.buffer_size = buffer_size
+        if in_memory not in [True, False, 'auto']:
+            raise ValueError(f"in_memory must be True, False, or 'auto', "
+                             f"but got {in_memory}.")
+        self.in_memory = in_memory
+        self._cache = None
+        self._cache_key = None
+
+    def _use_cache(self) -> bool:
+        """ Decide whether to cache sequences in memory. """
+        if self.in_memory == 'auto':
+            # The size of compressed files and pipes does not tell
+            # how much memory the cache needs, so only cache indexed files
+            # (whose last offset is the file size).
+            if self.offsets is None:
+                return False
+            available = _available_memory()
+            return available is not None and available > 2 * int(self.offsets[-1])
+        return self.in_memory
+
+    def _caching(self, dataset_iter, cache_key):
+        """ Pass through sequences, and keep them, if iteration completes. """
+        cache = []
+        for item in dataset_iter:
+            cache.append(item)
+            yield item
+        self._cache = cache
+        self._cache_key = cache_key
 
     def __iter__(self):
+        worker_info = _get_worker_info()
+        cache_key = (worker_info.num_workers, worker_info.id)
+        if self._cache is not None and self._cache_key == cache_key:
+            for i in np.random.permutation(len(self._cache)):
+                yield self._cache[i]
+            return
+
         shufbuf = []
-        worker_info = torch.utils.data.get_worker_info()
-        if worker_info is None:
-            dataset_iter = ProteinIterator(self.file, self.labels, self.vocab,
-                                           self.f_format, n_skipped=0)
-        else:
-            dataset_iter = ProteinIterator(self.file, self.labels, self.vocab,
-                                           self.f_format, n_skipped=self.n_skipped,
-                                           num_workers=worker_info.num_workers,
-                                           worker_id=worker_info.id)
+        dataset_iter = ProteinIterator(self.file, self.labels, self.vocab,
+                                       self.f_format, n_skipped=self.n_skipped,
+                                       num_workers=worker_info.num_workers,
+                                       worker_id=worker_info.id, lut=self.lut,
+                                       label_from_id=self.label_from_id,
+                                       offsets=self.offsets,
+                                       selection=self.selection,
+                                       keep_string=self.keep_string)
+        if self._use_cache():
+            dataset_iter = self._caching(dataset_iter, cache_key)
         try:
             for i in range(self.buffer_size):
                 shufbuf.append(next(dataset_iter))
@@ -461,6 +997,19 @@ class ShuffledProteinIterableDataset(ProteinIterableDataset):
             pass
 
 
+def _available_memory() -> Union[int, None]:
+    """ Available system memory in bytes, or None, if undetermined. """
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
 def _rename_labels_columns(df):
     """ Sequence IDs and labels are assumed in named columns,
     but if not, let's try a specific order and hope for the best
@@ -505,18 +1054,25 @@ class ProteinDataset(Dataset):
         Provide a label encoder during validation.
     verbose: int, optional
         Control verbosity of logging.
+    keep_string : bool, optional
+        Store the sequence string in the ``string`` field of each sequence.
+        By default, ``string`` is None, which saves one string allocation
+        per sequence, since collating and models only use the encoded
+        sequence.
     """
     def __init__(self, sequences: Union[Sequence[SeqRecord], str, Path],
                  labels: Union[pd.DataFrame, str, Path, None] = None,
                  f_format: str = 'fasta',
                  label_encoder: Union[LabelEncoder, None] = None,
                  verbose: int = 0,
+                 keep_string: bool = False,
                  ):
         self.sequences = sequences
         self.labels = labels
         self.f_format = f_format
         self.label_encoder = label_encoder
         self.verbose = verbose
+        self.keep_string = keep_string
         self.logger = get_logger(__name__, verbose=self.verbose)
 
         # Read labels, if available
@@ -558,8 +1114,7 @@ class ProteinDataset(Dataset):
                                         f'sequences of unknown classes.')
                     self.labels['label_num'] = self.label_encoder.transform(
                         self.labels.eggnog_id)
-            self.label_from_id = {row.protein_id: row.label_num
-                                  for row in self.labels.itertuples()}
+            self.label_from_id = _gen_label_from_id(self.labels)
 
         self.logger.info('Loading sequences')
         try:
@@ -587,6 +1142,7 @@ class ProteinDataset(Dataset):
         # Generate amino-acid vocabulary
         self.alphabet = EXTENDED_IUPAC_PROTEIN_ALPHABET
         self.vocab = gen_amino_acid_vocab(self.alphabet)
+        self.lut = _gen_lookup_table(self.vocab)
 
         self.n_skipped = SynchronizedCounter(init=0)
         self.logger.debug('Dataset init complete')
@@ -596,12 +1152,12 @@ class ProteinDataset(Dataset):
 
     def __getitem__(self, item):
         seq = self.sequences[item]
-        sequence_id: str = f'{seq.id}'
+        sequence_id: str = seq.id
         label = self.label_from_id.get(sequence_id, None)
-        encoded = [self.vocab.get(c, 0) for c in seq]
+        encoded = _encode(seq.seq, self.lut)
         sequence = sequence_tuple(index=item,
                                   id=sequence_id,
-                                  string=str(seq.seq),
+                                  string=str(seq.seq) if self.keep_string else None,
                                   encoded=encoded,
                                   label=label)
         return sequence
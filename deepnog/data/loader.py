@@ -0,0 +1,137 @@
+"""
+Date: 2026-10-15
+
+Description:
+
+    Prefetch batches of protein sequences in a background thread,
+    overlapping data loading and host-to-device copies with model compute.
+"""
+# SPDX-License-Identifier: BSD-3-Clause
+import queue
+import threading
+
+from .dataset import collate_packed_on_device, packed_sequences
+from ..utils import try_import_pytorch
+
+torch = try_import_pytorch()
+
+__all__ = ['PrefetchedProteinLoader',
+           ]
+
+_END_OF_DATA = object()
+
+
+class PrefetchedProteinLoader:
+    """ Wrap a DataLoader to prefetch batches in a background thread.
+
+    A background thread pulls batches from the wrapped DataLoader,
+    and pushes them onto the target device, while the main thread
+    consumes previous batches. On CUDA devices, host-to-device copies
+    are issued with ``non_blocking=True`` on a dedicated stream,
+    so that they overlap with computations on the default stream.
+    For best results, construct the DataLoader with ``pin_memory=True``.
+
+    The DataLoader may also yield ``packed_sequences`` (e.g. from
+    ``ProteinIterableDataset(..., batch_size=n)`` with
+    ``DataLoader(..., batch_size=None)``). These are encoded and zero-padded
+    on the target device with ``collate_packed_on_device``.
+
+    Parameters
+    ----------
+    data_loader : DataLoader
+        PyTorch DataLoader yielding ``collated_sequences``,
+        e.g. with ``collate_fn=collate_sequences``.
+    device : [str, torch.device], optional
+        Device to copy sequences and labels to.
+    prefetch : int, optional
+        Maximum number of batches to hold ready in the queue.
+    collate_kwargs : dict, optional
+        Keyword arguments for ``collate_packed_on_device`` (e.g.
+        ``min_length``, ``random_padding``, ``lut``, ``has_labels``),
+        used for batches of ``packed_sequences``.
+    """
+    def __init__(self, data_loader, device='cpu', prefetch: int = 2,
+                 collate_kwargs: dict = None):
+        self.data_loader = data_loader
+        self.device = torch.device(device)
+        self.prefetch = prefetch
+        self.collate_kwargs = {} if collate_kwargs is None else dict(collate_kwargs)
+        if self.device.type == 'cuda':
+            self.stream = torch.cuda.Stream(device=self.device)
+        else:
+            self.stream = None
+
+    def __len__(self):
+        return len(self.data_loader)
+
+    def _transfer(self, batch):
+        """ Copy (or collate) sequences and labels of a batch onto the device. """
+        if isinstance(batch, packed_sequences):
+            return collate_packed_on_device(batch, self.device,
+                                            **self.collate_kwargs)
+
+        def to_device(tensor):
+            if tensor is None:
+                return None
+            return tensor.to(self.device, non_blocking=True)
+
+        return batch._replace(sequences=to_device(batch.sequences),
+                              labels=to_device(batch.labels))
+
+    def _to_device(self, batch):
+        """ Transfer a batch, on the dedicated stream for CUDA devices. """
+        if self.stream is None:
+            return self._transfer(batch), None
+        with torch.cuda.stream(self.stream):
+            batch = self._transfer(batch)
+            copied = torch.cuda.Event()
+            copied.record(self.stream)
+        return batch, copied
+
+    @staticmethod
+    def _put(buffer: queue.Queue, item, stop: threading.Event) -> bool:
+        """ Enqueue an item, unless the consumer stopped iterating. """
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, buffer: queue.Queue, stop: threading.Event):
+        """ Load batches and enqueue them, until exhausted or stopped. """
+        try:
+            for batch in self.data_loader:
+                if not self._put(buffer, self._to_device(batch), stop):
+                    return
+        except Exception as e:  # re-raised in the consuming thread
+            self._put(buffer, e, stop)
+        self._put(buffer, _END_OF_DATA, stop)
+
+    def __iter__(self):
+        buffer = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._produce,
+                                  args=(buffer, stop),
+                                  daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is _END_OF_DATA:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                batch, copied = item
+                if copied is not None:
+                    # Make the default stream wait for the H2D copy,
+                    # and tell the allocator the tensors are used there.
+                    current = torch.cuda.current_stream(self.device)
+                    current.wait_event(copied)
+                    for tensor in (batch.sequences, batch.labels):
+                        if tensor is not None:
+                            tensor.record_stream(current)
+                yield batch
+        finally:
+            stop.set()
@@ -0,0 +1,77 @@
+"""
+Date: 2026-10-15
+
+Description:
+
+    Batch samplers that group protein sequences of similar length,
+    in order to reduce zero-padding.
+"""
+# SPDX-License-Identifier: BSD-3-Clause
+from typing import Iterator, List, Sequence
+
+import numpy as np
+
+from ..utils import try_import_pytorch
+
+torch = try_import_pytorch()
+from torch.utils.data import Sampler  # noqa
+
+__all__ = ['LengthBucketedBatchSampler',
+           ]
+
+
+class LengthBucketedBatchSampler(Sampler):
+    """ Yield batches of indices of sequences with similar length.
+
+    Sequences are sorted by length, and split into ``bucket_count`` buckets
+    of (almost) equal size. Each batch is drawn from a single bucket,
+    so that sequences in a batch require little zero-padding
+    in ``collate_sequences``.
+
+    Use with map-style datasets, e.g. ``ProteinDataset``, like this:
+    ``DataLoader(dataset, batch_sampler=sampler, collate_fn=collate_sequences)``.
+
+    Parameters
+    ----------
+    lengths : sequence of int
+        Length of each sequence in the dataset. Byte lengths of
+        FASTA records (e.g. ``np.diff(offsets)``) are a good proxy.
+    batch_size : int
+        Maximum number of sequences per batch.
+        Batches at the end of a bucket may be smaller.
+    bucket_count : int, optional
+        Number of length buckets.
+    shuffle : bool, optional
+        Shuffle sequences within buckets, and the order of batches,
+        in each epoch. Otherwise, yield batches in order of increasing length.
+    """
+    def __init__(self, lengths: Sequence[int], batch_size: int,
+                 bucket_count: int = 64, shuffle: bool = True):
+        if batch_size < 1:
+            raise ValueError(f'batch_size must be a positive integer, '
+                             f'but got {batch_size}.')
+        if bucket_count < 1:
+            raise ValueError(f'bucket_count must be a positive integer, '
+                             f'but got {bucket_count}.')
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.bucket_count = bucket_count
+        self.shuffle = shuffle
+
+        order = np.argsort(self.lengths, kind='stable')
+        n_buckets = min(self.bucket_count, max(1, order.size))
+        self.buckets: List[np.ndarray] = np.array_split(order, n_buckets)
+
+    def __iter__(self) -> Iterator[List[int]]:
+        batches = []
+        for bucket in self.buckets:
+            if self.shuffle:
+                bucket = np.random.permutation(bucket)
+            for start in range(0, bucket.size, self.batch_size):
+                batches.append(bucket[start:start + self.batch_size].tolist())
+        if self.shuffle:
+            batches = [batches[i] for i in np.random.permutation(len(batches))]
+        return iter(batches)
+
+    def __len__(self) -> int:
+        return sum(-(-bucket.size // self.batch_size) for bucket in self.buckets)
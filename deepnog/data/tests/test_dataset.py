@@ -7,9 +7,12 @@ Description:
 """
 from itertools import repeat
 from functools import partial
+import os
+import threading
 import pytest
 
 import numpy as np
+import torch
 from pandas import read_csv
 from sklearn.preprocessing import LabelEncoder
 from torch.utils.data import DataLoader
@@ -17,6 +20,7 @@ from Bio.Seq import Seq
 from Bio.SeqRecord import SeqRecord
 
 from deepnog.data import dataset as ds
+from deepnog.data import _numba_kernels
 from deepnog.tests.utils import get_deepnog_root
 
 TESTS = get_deepnog_root()/"tests"
@@ -111,6 +115,17 @@ def test_correct_encoding():
         assert((i+1) == batch)
 
 
+def test_lookup_table_encoding():
+    """ Test byte lookup table encoding agrees with the vocabulary. """
+    vocab = ds.gen_amino_acid_vocab()
+    lut = ds._gen_lookup_table(vocab)
+    test_string = 'ACDEFGHIKLMNPQRSTVWYBXZJUOacdxz*-?'
+    expected = [vocab.get(c, 0) for c in test_string]
+    encoded = ds._encode(Seq(test_string), lut)
+    assert encoded.dtype == np.uint8
+    np.testing.assert_array_equal(encoded, expected)
+
+
 @pytest.mark.parametrize('batch_size', [1, 2, 10])
 @pytest.mark.parametrize('num_workers', [0, 2])
 @pytest.mark.parametrize('buffer_size', [2, 10, 30])
@@ -171,6 +186,8 @@ def test_protein_dataset():
 
     seq_records = list(repeat(SeqRecord(Seq('MATTAC'), id='seq1', name='seq1'), 22))
     dataset = ds.ProteinDataset(seq_records, labels=TRAINING_LABELS)
+    assert dataset[0].string is None
+    dataset = ds.ProteinDataset(seq_records, labels=TRAINING_LABELS, keep_string=True)
     for i in range(22):
         assert dataset[i].id == 'seq1'
         assert dataset[i].index == i
@@ -183,3 +200,281 @@ def test_protein_dataset():
     with pytest.raises(ValueError, match="must be FASTA file or a list/tuple "
                                          "of <class 'Bio.SeqRecord.SeqRecord'>"):
         _ = ds.ProteinDataset(sequences, labels=TRAINING_LABELS)
+
+
+@pytest.mark.parametrize('numba_available', [False, True])
+def test_collate_with_and_without_numba(monkeypatch, numba_available):
+    """ Test Numba and NumPy collating produce identical batches. """
+    if numba_available and not ds._NUMBA_AVAILABLE:
+        pytest.skip('Numba is not installed')
+    monkeypatch.setattr(ds, '_NUMBA_AVAILABLE', numba_available)
+    lut = ds._gen_lookup_table(ds.gen_amino_acid_vocab())
+    batch = [ds.sequence_tuple(index=i, id=f'seq{i}', string=s,
+                               encoded=ds._encode(s, lut), label=None)
+             for i, s in enumerate(['MATTAC', 'AC', 'ACDEFGHIKLMNPQRSTVWY'])]
+    collated = ds.collate_sequences(batch, min_length=8)
+    assert collated.sequences.shape == (3, 20)
+    assert collated.sequences.dtype == torch.uint8
+    for i, seq in enumerate(batch):
+        np.testing.assert_array_equal(
+            collated.sequences[i, :len(seq.encoded)].numpy(), seq.encoded)
+        assert collated.sequences[i, len(seq.encoded):].sum() == 0
+
+
+@pytest.mark.parametrize('num_workers', [0, 2])
+@pytest.mark.parametrize('labels', [None, TRAINING_LABELS])
+def test_packed_sequences(num_workers, labels):
+    """ Test packed batches collate to the same batches as single sequences. """
+    batch_size = 4
+    dataset = ds.ProteinIterableDataset(TRAINING_FASTA, labels_file=labels)
+    expected = list(DataLoader(dataset,
+                               batch_size=batch_size,
+                               num_workers=num_workers,
+                               collate_fn=ds.collate_sequences))
+    packed_dataset = ds.ProteinIterableDataset(TRAINING_FASTA,
+                                               labels_file=labels,
+                                               batch_size=batch_size)
+    packed_loader = DataLoader(packed_dataset,
+                               batch_size=None,
+                               num_workers=num_workers,
+                               collate_fn=ds.collate_sequences)
+    observed = list(packed_loader)
+    assert len(observed) == len(expected)
+    if labels is not None:
+        assert len(packed_loader) == len(expected)
+    for obs, exp in zip(observed, expected):
+        assert obs.ids == exp.ids
+        assert obs.indices == exp.indices
+        np.testing.assert_array_equal(obs.sequences, exp.sequences)
+        if labels is None:
+            assert obs.labels is None
+        else:
+            np.testing.assert_array_equal(obs.labels, exp.labels)
+
+
+@pytest.mark.parametrize('chunk_size', [7, 2**20])
+def test_fasta_record_offsets(chunk_size):
+    """ Test record offsets agree with Biopython parsing. """
+    offsets = ds._fasta_record_offsets(test_file, chunk_size=chunk_size)
+    records = list(ds.SeqIO.parse(str(test_file), format='fasta'))
+    assert offsets.size == len(records) + 1
+    with open(test_file, 'rb') as f:
+        data = f.read()
+    assert offsets[-1] == len(data)
+    for i in [0, 1, len(records) - 1]:
+        assert data[offsets[i]:offsets[i] + 1] == b'>'
+        indexed = list(ds._iter_indexed_records(test_file, offsets,
+                                                start=i, step=len(records)))
+        assert len(indexed) == 1
+        pos, record = indexed[0]
+        assert pos == i + 1
+        assert record.id == records[i].id
+        assert record.seq == bytes(records[i].seq)
+
+
+@pytest.mark.parametrize('f', ['test_skip_empty_sequences.faa',
+                               'test_training_dummy.faa',
+                               'test_zeroPadding.faa',
+                               'GCF_000007025.1.faa'])
+def test_indexed_and_sequential_iteration_agree(f):
+    """ Test memory-mapped FASTA parsing agrees with Biopython. """
+    dataset = ds.ProteinIterableDataset(TESTS/'data'/f, keep_string=True)
+    assert dataset.offsets is not None
+    indexed = [(s.index, s.id, s.string, list(s.encoded)) for s in dataset]
+    dataset.offsets = None
+    sequential = [(s.index, s.id, s.string, list(s.encoded)) for s in dataset]
+    assert indexed == sequential
+
+
+def test_offset_index_only_for_uncompressed_fasta():
+    assert ds.ProteinIterableDataset(test_file).offsets is not None
+    assert ds.ProteinIterableDataset(test_file_gzip).offsets is None
+
+
+@pytest.mark.parametrize('in_memory', [True, 'auto'])
+def test_shuffled_dataset_in_memory(monkeypatch, in_memory):
+    dataset = ds.ShuffledProteinIterableDataset(TRAINING_FASTA,
+                                                labels_file=TRAINING_LABELS,
+                                                buffer_size=10,
+                                                in_memory=in_memory)
+    first_epoch = [seq.id for seq in dataset]
+    assert sorted(first_epoch) == sorted(EXPECTED_IDS_WITH_LABEL)
+    assert len(dataset._cache) == len(EXPECTED_IDS_WITH_LABEL)
+
+    # Subsequent epochs must not parse the file again
+    def no_parsing(*args, **kwargs):
+        raise AssertionError('Sequence file parsed again')
+    monkeypatch.setattr(ds, 'ProteinIterator', no_parsing)
+    second_epoch = [seq.id for seq in dataset]
+    assert sorted(second_epoch) == sorted(first_epoch)
+
+    with pytest.raises(ValueError, match='in_memory must be'):
+        _ = ds.ShuffledProteinIterableDataset(TRAINING_FASTA, in_memory='yes')
+
+
+@pytest.mark.parametrize('min_length, max_length', [(1, 10), (100, 1000)])
+def test_pad_into_numpy(min_length, max_length):
+    """ Test scatter and row-wise NumPy padding against the reference loop. """
+    n_data = 32
+    lengths = np.random.randint(min_length, max_length, n_data)
+    offsets = np.zeros(n_data + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    flat = np.random.randint(1, 27, offsets[-1]).astype(np.uint8)
+    max_len = lengths.max()
+    starts = (np.random.rand(n_data) * (max_len - lengths + 1)).astype(np.int64)
+    expected = np.zeros((n_data, max_len), dtype=np.uint8)
+    _numba_kernels._pad_into(expected, flat, offsets, starts)
+    observed = np.zeros_like(expected)
+    ds._pad_into_numpy(observed, flat, offsets, starts)
+    np.testing.assert_array_equal(observed, expected)
+
+
+def test_select_labeled_records():
+    dataset = ds.ProteinIterableDataset(TRAINING_FASTA)
+    assert dataset.selection is None
+    dataset = ds.ProteinIterableDataset(TRAINING_FASTA, labels_file=TRAINING_LABELS)
+    assert dataset.selection.size == len(EXPECTED_IDS_WITH_LABEL)
+    observed = [seq.id for seq in dataset]
+    assert sorted(observed) == sorted(EXPECTED_IDS_WITH_LABEL)
+
+
+def test_collate_has_labels():
+    lut = ds._gen_lookup_table(ds.gen_amino_acid_vocab())
+    batch = [ds.sequence_tuple(index=i, id=f'seq{i}', string=None,
+                               encoded=ds._encode('MATTAC', lut), label=i)
+             for i in range(3)]
+    assert ds.collate_sequences(batch, has_labels=False).labels is None
+    for has_labels in [None, True]:
+        labels = ds.collate_sequences(batch, has_labels=has_labels).labels
+        np.testing.assert_array_equal(labels, [0, 1, 2])
+    batch = [seq._replace(label=None) for seq in batch]
+    assert ds.collate_sequences(batch).labels is None
+    with pytest.raises(TypeError):
+        _ = ds.collate_sequences(batch, has_labels=True)
+
+
+@pytest.mark.parametrize('labels', [None, TRAINING_LABELS])
+def test_collate_packed_on_device(labels):
+    """ Test device collation agrees with host collation (on CPU). """
+    dataset = ds.ProteinIterableDataset(TRAINING_FASTA, labels_file=labels,
+                                        batch_size=7)
+    for batch in dataset:
+        expected = ds.collate_sequences(batch)
+        observed = ds.collate_packed_on_device(batch, device='cpu')
+        assert observed.ids == expected.ids
+        assert observed.indices == expected.indices
+        assert torch.equal(observed.sequences, expected.sequences)
+        if labels is None:
+            assert observed.labels is None
+        else:
+            assert torch.equal(observed.labels, expected.labels)
+        random_padded = ds.collate_packed_on_device(batch, random_padding=True)
+        assert torch.equal((random_padded.sequences > 0).sum(axis=1),
+                           (expected.sequences > 0).sum(axis=1))
+
+
+@pytest.mark.skipif(not hasattr(os, 'mkfifo'), reason='requires named pipes')
+def test_named_pipe_is_parsed_sequentially(tmp_path):
+    """ Test pipes (e.g. process substitution) are read only once. """
+    fifo = tmp_path/'sequences.faa'
+    os.mkfifo(fifo)
+    dataset = ds.ProteinIterableDataset(fifo)
+    assert dataset.offsets is None
+
+    def write():
+        with open(fifo, 'wb') as f:
+            f.write(TRAINING_FASTA.read_bytes())
+    writer = threading.Thread(target=write, daemon=True)
+    writer.start()
+    n_sequences = sum(1 for _ in dataset)
+    writer.join()
+    expected = sum(1 for _ in ds.ProteinIterableDataset(TRAINING_FASTA))
+    assert n_sequences == expected
+
+
+@pytest.mark.parametrize('content', ['ACGT\n', 'comment\n>a\nACGT\n', '\n>a\nACGT\n'])
+def test_malformed_fasta_raises(tmp_path, content):
+    """ Test files not starting with a record are rejected like by Biopython. """
+    file = tmp_path/'malformed.faa'
+    file.write_text(content)
+    dataset = ds.ProteinIterableDataset(file)
+    assert dataset.offsets is None
+    with pytest.raises(ValueError):
+        list(dataset)
+
+
+@pytest.mark.parametrize('body', ['ACGT\t\nAC GT\r\n',
+                                  'AC\tGT \t\nACGT\n',
+                                  'AC\rGT\n\n'])
+def test_indexed_and_sequential_iteration_agree_on_whitespace(tmp_path, body):
+    """ Test tabs and carriage returns are removed like by Biopython. """
+    file = tmp_path/'whitespace.faa'
+    file.write_bytes(f'>first\n{body}>second desc\nKLMN\n'.encode())
+    dataset = ds.ProteinIterableDataset(file)
+    assert dataset.offsets is not None
+    indexed = [(s.index, s.id, list(s.encoded)) for s in dataset]
+    dataset.offsets = None
+    sequential = [(s.index, s.id, list(s.encoded)) for s in dataset]
+    assert indexed == sequential
+
+
+def test_collate_packed_has_labels():
+    """ Test packed batches handle has_labels like lists of sequences. """
+    unlabeled = next(iter(ds.ProteinIterableDataset(TRAINING_FASTA, batch_size=4)))
+    labeled = next(iter(ds.ProteinIterableDataset(TRAINING_FASTA, batch_size=4,
+                                                  labels_file=TRAINING_LABELS)))
+    for collate in [ds.collate_sequences, ds.collate_packed_on_device]:
+        assert collate(labeled, has_labels=False).labels is None
+        for has_labels in [None, True]:
+            labels = collate(labeled, has_labels=has_labels).labels
+            np.testing.assert_array_equal(labels, labeled.labels)
+        assert collate(unlabeled).labels is None
+        with pytest.raises(TypeError):
+            _ = collate(unlabeled, has_labels=True)
+
+
+@pytest.mark.parametrize('num_workers', [0, 2])
+def test_skipped_sequences_counted_in_all_workers(num_workers):
+    """ Test empty ids are counted both in the main process and in workers. """
+    dataset = ds.ProteinIterableDataset(TESTS/'data/test_skip_empty_sequences.faa')
+    loader = DataLoader(dataset, batch_size=8, num_workers=num_workers,
+                        collate_fn=ds.collate_sequences)
+    n_sequences = sum(len(batch.ids) for batch in loader)
+    assert n_sequences == 70
+    assert int(dataset.n_skipped) == 20
+
+
+@pytest.mark.parametrize('batch_size', [None, 8])
+def test_skipped_sequences_counted_once_at_end(batch_size):
+    """ Test the shared skip counter is updated once, after the last sequence. """
+    dataset = ds.ProteinIterableDataset(TESTS/'data/test_skip_empty_sequences.faa',
+                                        batch_size=batch_size)
+    increments = []
+    increment = dataset.n_skipped.increment
+
+    def counting_increment(n=1):
+        increments.append(n)
+        increment(n)
+    dataset.n_skipped.increment = counting_increment
+
+    iterator = iter(dataset)
+    next(iterator)
+    assert int(dataset.n_skipped) == 0
+    for _ in iterator:
+        pass
+    assert increments == [20]
+    assert int(dataset.n_skipped) == 20
+
+
+@pytest.mark.parametrize('file, file_size', [(test_file, test_file.stat().st_size),
+                                             (test_file_gzip, None)])
+def test_shuffled_dataset_in_memory_auto(monkeypatch, file, file_size):
+    """ Test 'auto' caching depends on the uncompressed file size only. """
+    dataset = ds.ShuffledProteinIterableDataset(file, in_memory='auto')
+    monkeypatch.setattr(ds, '_available_memory', lambda: 10**15)
+    assert dataset._use_cache() is (file_size is not None)
+    if file_size is not None:
+        monkeypatch.setattr(ds, '_available_memory', lambda: 2 * file_size)
+        assert not dataset._use_cache()
+        monkeypatch.setattr(ds, '_available_memory', lambda: 2 * file_size + 1)
+        assert dataset._use_cache()
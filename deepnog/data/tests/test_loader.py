@@ -0,0 +1,78 @@
+"""
+Date: 2026-10-15
+Description:
+    Test prefetching data loader.
+"""
+import pytest
+
+import torch
+from torch.utils.data import DataLoader
+
+from deepnog.data import collate_sequences, PrefetchedProteinLoader
+from deepnog.data import ProteinIterableDataset
+from deepnog.tests.utils import get_deepnog_root
+
+TESTS = get_deepnog_root()/"tests"
+TRAINING_FASTA = TESTS/"data/test_training_dummy.faa"
+TRAINING_LABELS = TESTS/"data/test_training_dummy.faa.csv"
+
+
+@pytest.mark.parametrize('num_workers', [0, 2])
+@pytest.mark.parametrize('labels', [None, TRAINING_LABELS])
+def test_prefetched_loader_yields_all_batches(num_workers, labels):
+    dataset = ProteinIterableDataset(TRAINING_FASTA, labels_file=labels)
+    data_loader = DataLoader(dataset,
+                             batch_size=4,
+                             num_workers=num_workers,
+                             collate_fn=collate_sequences)
+    expected = list(data_loader)
+    observed = list(PrefetchedProteinLoader(data_loader, device='cpu'))
+    assert len(observed) == len(expected)
+    for obs, exp in zip(observed, expected):
+        assert obs.ids == exp.ids
+        assert obs.indices == exp.indices
+        assert torch.equal(obs.sequences, exp.sequences)
+        if labels is None:
+            assert obs.labels is None
+        else:
+            assert torch.equal(obs.labels, exp.labels)
+
+
+def test_prefetched_loader_stops_early_and_raises():
+    dataset = ProteinIterableDataset(TRAINING_FASTA)
+    data_loader = DataLoader(dataset, batch_size=1, collate_fn=collate_sequences)
+    loader = PrefetchedProteinLoader(data_loader, prefetch=1)
+    for _ in loader:
+        break
+
+    def broken_collate(batch):
+        raise RuntimeError('broken batch')
+    data_loader = DataLoader(dataset, batch_size=1, collate_fn=broken_collate)
+    with pytest.raises(RuntimeError, match='broken batch'):
+        for _ in PrefetchedProteinLoader(data_loader):
+            pass
+
+
+def test_prefetched_loader_collates_packed_sequences():
+    dataset = ProteinIterableDataset(TRAINING_FASTA, labels_file=TRAINING_LABELS)
+    expected = list(DataLoader(dataset, batch_size=4, collate_fn=collate_sequences))
+    packed_dataset = ProteinIterableDataset(TRAINING_FASTA, labels_file=TRAINING_LABELS,
+                                            batch_size=4)
+    observed = list(PrefetchedProteinLoader(DataLoader(packed_dataset, batch_size=None)))
+    assert len(observed) == len(expected)
+    for obs, exp in zip(observed, expected):
+        assert obs.ids == exp.ids
+        assert torch.equal(obs.sequences, exp.sequences)
+        assert torch.equal(obs.labels, exp.labels)
+
+
+def test_prefetched_loader_forwards_collate_kwargs():
+    packed_dataset = ProteinIterableDataset(TRAINING_FASTA, batch_size=4)
+    data_loader = DataLoader(packed_dataset, batch_size=None)
+    loader = PrefetchedProteinLoader(data_loader,
+                                     collate_kwargs={'min_length': 1000})
+    assert all(batch.sequences.shape[1] == 1000 for batch in loader)
+    loader = PrefetchedProteinLoader(data_loader,
+                                     collate_kwargs={'has_labels': True})
+    with pytest.raises(TypeError):
+        _ = list(loader)
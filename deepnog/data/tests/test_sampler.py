@@ -0,0 +1,62 @@
+"""
+Date: 2026-10-15
+Description:
+    Test length-bucketed batch sampler.
+"""
+from functools import partial
+
+import pytest
+
+import numpy as np
+from torch.utils.data import DataLoader
+
+from deepnog.data import collate_sequences, LengthBucketedBatchSampler, ProteinDataset
+from deepnog.tests.utils import get_deepnog_root
+
+TESTS = get_deepnog_root()/"tests"
+PROTEOME_FASTA = TESTS/"data/GCF_000007025.1.faa"
+
+
+@pytest.mark.parametrize('shuffle', [False, True])
+@pytest.mark.parametrize('bucket_count', [1, 4, 1000])
+def test_batches_cover_all_indices(shuffle, bucket_count):
+    lengths = np.random.randint(10, 1000, 101)
+    sampler = LengthBucketedBatchSampler(lengths, batch_size=8,
+                                         bucket_count=bucket_count, shuffle=shuffle)
+    batches = list(sampler)
+    assert len(batches) == len(sampler)
+    assert all(0 < len(batch) <= 8 for batch in batches)
+    indices = [i for batch in batches for i in batch]
+    assert sorted(indices) == list(range(101))
+    if not shuffle:
+        # Batches in order of increasing length
+        np.testing.assert_array_equal(lengths[indices], np.sort(lengths))
+
+
+def test_bucketing_reduces_padding():
+    dataset = ProteinDataset(PROTEOME_FASTA)
+    lengths = [len(record) for record in dataset.sequences]
+    sampler = LengthBucketedBatchSampler(lengths, batch_size=4)
+    collate = partial(collate_sequences, min_length=1)
+
+    def n_padded_cells(data_loader):
+        n_sequences = 0
+        n_cells = 0
+        for batch in data_loader:
+            n_sequences += len(batch.ids)
+            n_cells += batch.sequences.numel()
+        assert n_sequences == len(dataset)
+        return n_cells
+
+    bucketed = n_padded_cells(DataLoader(dataset, batch_sampler=sampler,
+                                         collate_fn=collate))
+    unbucketed = n_padded_cells(DataLoader(dataset, batch_size=4, shuffle=True,
+                                           collate_fn=collate))
+    assert sum(lengths) <= bucketed < unbucketed
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError, match='batch_size'):
+        _ = LengthBucketedBatchSampler([1, 2, 3], batch_size=0)
+    with pytest.raises(ValueError, match='bucket_count'):
+        _ = LengthBucketedBatchSampler([1, 2, 3], batch_size=1, bucket_count=0)
@@ -8,6 +8,7 @@ Description:
     Predict orthologous groups of protein sequences.
 """
 # SPDX-License-Identifier: BSD-3-Clause
+from functools import partial
 from os import environ
 from typing import List
 import warnings
@@ -15,6 +16,7 @@ import warnings
 from tqdm import tqdm
 
 from ..data.dataset import collate_sequences
+from ..data.loader import PrefetchedProteinLoader
 from ..utils import get_logger, try_import_pytorch
 
 torch = try_import_pytorch()
@@ -74,12 +76,15 @@ def predict(model, dataset, device='cpu', batch_size=16, num_workers=4,
 
     if num_workers < 2:
         num_workers = 0
-    # Create data-loader for protein dataset
+    # Create data-loader for protein dataset, which prefetches batches
+    # and pushes them to the device in the background
     data_loader = DataLoader(dataset,
                              batch_size=batch_size,
                              num_workers=num_workers,
-                             collate_fn=collate_sequences,
+                             collate_fn=partial(collate_sequences, has_labels=False),
+                             pin_memory=torch.device(device).type == 'cuda',
                              )
+    data_loader = PrefetchedProteinLoader(data_loader, device=device)
     try:
         n_sequences = len(dataset)
     except TypeError:
@@ -95,8 +100,8 @@ def predict(model, dataset, device='cpu', batch_size=16, num_workers=4,
                   unit='seq',
                   unit_scale=True) as pbar:
             for i, batch in enumerate(data_loader,):
-                # Push sequences on correct device
-                sequences = batch.sequences.to(device)
+                # Sequences were already pushed on correct device
+                sequences = batch.sequences
                 # Predict protein families
                 output = model(sequences)
                 output = model.softmax(output)
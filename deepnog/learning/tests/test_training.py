@@ -3,7 +3,7 @@ import tempfile
 import pytest
 import numpy as np
 
-from deepnog.learning import fit
+from deepnog.learning import fit, training
 from deepnog.tests.utils import get_deepnog_root
 
 DEEPNOG_TESTS = get_deepnog_root()/"tests"
@@ -73,3 +73,39 @@ def test_shuffled_training(batch_size, num_workers):
         assert x.shape == (2, 30)
     np.testing.assert_equal(results.y_train_true.sum(), Y_TRUE.sum())  # order should be different
     np.testing.assert_equal(results.y_val_pred.sum(), Y_TRUE.sum())
+
+
+@pytest.mark.parametrize("drop_last", [None, True])
+def test_training_bucket_by_length(monkeypatch, drop_last):
+    batch_sizes = []
+
+    class SpySampler(training.LengthBucketedBatchSampler):
+        def __iter__(self):
+            batches = list(super().__iter__())
+            batch_sizes.extend(len(batch) for batch in batches)
+            return iter(batches)
+    monkeypatch.setattr(training, 'LengthBucketedBatchSampler', SpySampler)
+
+    data_loader_params = {'batch_size': 4, 'num_workers': 0}
+    if drop_last is not None:
+        data_loader_params['drop_last'] = drop_last
+    results = fit(architecture='deepnog',
+                  module='deepnog',
+                  cls='DeepNOG',
+                  training_sequences=TRAINING_FASTA,
+                  validation_sequences=TRAINING_FASTA,
+                  training_labels=TRAINING_CSV,
+                  validation_labels=TRAINING_CSV,
+                  data_loader_params=data_loader_params,
+                  device='cpu',
+                  verbose=0,
+                  n_epochs=1,
+                  shuffle=True,
+                  bucket_by_length=True,
+                  random_seed=1,
+                  tensorboard_dir=None,
+                  save_each_epoch=False,
+                  )
+    assert sum(batch_sizes) == 30
+    assert results.y_train_true.shape == (1, 30)
+    np.testing.assert_equal(results.y_train_true.sum(), Y_TRUE[0].sum())
@@ -26,7 +26,7 @@ import numpy as np
 from tqdm.auto import tqdm
 
 from ..data import ProteinDataset, ProteinIterableDataset, ShuffledProteinIterableDataset
-from ..data import collate_sequences
+from ..data import collate_sequences, LengthBucketedBatchSampler
 from ..utils import count_parameters, get_config, get_logger, load_nn, set_device
 from ..utils import try_import_pytorch
 
@@ -334,6 +334,7 @@ def fit(architecture, module, cls,
         iterable_dataset: bool = False,
         n_epochs: int = 15,
         shuffle: bool = False,
+        bucket_by_length: bool = False,
         learning_rate: float = 1e-2,
         learning_rate_params: dict = None,
         l2_coeff: float = None,
@@ -379,6 +380,10 @@ def fit(architecture, module, cls,
             Shuffle the training data. This does NOT shuffle the complete data
             set, which requires having all sequences in memory, but uses a
             shuffle buffer (default size: 2**16), from which sequences are drawn.
+        bucket_by_length : bool, default False
+            Draw training batches from buckets of sequences with similar
+            length, which reduces zero-padding (see LengthBucketedBatchSampler).
+            Only available for in-memory datasets (``iterable_dataset=False``).
         learning_rate : float
             Learning rate, the central hyperparameter of deep network training.
             Too high values may lead to diverging solutions, while too low
@@ -437,7 +442,8 @@ def fit(architecture, module, cls,
                                   'num_workers': 4,
                                   'collate_fn': partial(
                                       collate_sequences,
-                                      zero_padding=True),
+                                      zero_padding=True,
+                                      has_labels=True),
                                   'pin_memory': True,
                                   }
     if data_loader_params is not None:
@@ -484,6 +490,26 @@ def fit(architecture, module, cls,
         data_loader_params.update({'shuffle': shuffle})
     data_loader = {phase: DataLoader(d, **data_loader_params)
                    for phase, d in dataset.items()}
+    if bucket_by_length:
+        if iterable_dataset:
+            logger.warning('Ignoring bucket_by_length, which is not available '
+                           'for iterable datasets.')
+        else:
+            logger.info('Drawing training batches from buckets of similar length.')
+            sampler = LengthBucketedBatchSampler(
+                lengths=[len(record) for record in dataset['train'].sequences],
+                batch_size=data_loader_params['batch_size'],
+                shuffle=shuffle)
+            # These options are mutually exclusive with a batch sampler
+            ignored = ['batch_size', 'shuffle', 'sampler', 'drop_last']
+            if data_loader_params.get('drop_last') or data_loader_params.get('sampler'):
+                logger.warning('Ignoring "drop_last" and "sampler" in data_loader_params '
+                               'for the training set, when bucket_by_length=True.')
+            batch_sampler_params = {k: v for k, v in data_loader_params.items()
+                                    if k not in ignored}
+            data_loader['train'] = DataLoader(dataset['train'],
+                                              batch_sampler=sampler,
+                                              **batch_sampler_params)
 
     # Deep network hyperparameter default values
     config = get_config(config_file)
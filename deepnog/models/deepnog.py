@@ -52,7 +52,8 @@ class AminoAcidWordEmbedding(nn.Module):
             The sequence (densely) embedded in a space of dimension
             embedding_dim.
         """
-        # Fix type mismatch on Windows
+        # Sequences are collated as uint8 to save memory bandwidth,
+        # but embedding requires int64 indices
         x = sequence.long()
 
         x = self.embedding(x)